@@ -1,18 +1,32 @@
 # Copyright (C) 2025 Arcee AI
 # SPDX-License-Identifier: BUSL-1.1
 
+import functools
 import importlib.resources
+import itertools
 import logging
 import re
-import string
+import sys
 import warnings
 from abc import ABC, abstractmethod
 from collections import defaultdict
 from pathlib import Path
-from typing import ClassVar, Dict, List, Optional, Tuple, Union
+from types import MappingProxyType
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from huggingface_hub import snapshot_download
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 from transformers import PretrainedConfig
 from typing_extensions import Literal
 
@@ -63,11 +77,11 @@ class ProceduralSpaceInfo(BaseModel, frozen=True):
     Attributes:
         name (str): The name of the space defined.
         type (str): The type of procedural space.
-        inputs (List[str]): List of names of spaces used to define this space."""
+        inputs (Tuple[str, ...]): Names of spaces used to define this space."""
 
     name: str
     type: Literal["residual"]
-    inputs: List[str]
+    inputs: Tuple[str, ...]
 
 
 class ArchitectureInfo(ABC):
@@ -108,14 +122,20 @@ class ArchitectureInfo(ABC):
         """Return the number of layers in a model."""
         return getattr(config, self.num_layers_config_key())
 
+    def iter_all_weights(self, config: PretrainedConfig) -> Iterator[WeightInfo]:
+        """Iterate over all weights associated with a model, in order."""
+        return itertools.chain(
+            self.pre_weights(config),
+            itertools.chain.from_iterable(
+                self.layer_weights(layer_idx, config)
+                for layer_idx in range(self.num_layers(config))
+            ),
+            self.post_weights(config),
+        )
+
     def all_weights(self, config: PretrainedConfig) -> List[WeightInfo]:
         """Return all weights associated with a model."""
-        num_layers = self.num_layers(config)
-        res = list(self.pre_weights(config))
-        for layer_idx in range(num_layers):
-            res.extend(self.layer_weights(layer_idx, config))
-        res.extend(self.post_weights(config))
-        return res
+        return list(self.iter_all_weights(config))
 
     def procedural_spaces(self, config: PretrainedConfig) -> List[ProceduralSpaceInfo]:
         """Return a list of all procedurally defined spaces in a model."""
@@ -151,6 +171,9 @@ class ConfiguredArchitectureInfo(BaseModel, frozen=True, arbitrary_types_allowed
     def procedural_spaces(self) -> List[ProceduralSpaceInfo]:
         return self.info.procedural_spaces(self.config)
 
+    def iter_all_weights(self) -> Iterator[WeightInfo]:
+        return self.info.iter_all_weights(self.config)
+
     def all_weights(self) -> List[WeightInfo]:
         return self.info.all_weights(self.config)
 
@@ -170,8 +193,127 @@ class JSONArchitectureDefinition(BaseModel, frozen=True):
     num_layers_config_key: Optional[str] = None
 
 
-class TemplateWithArithmetic(string.Template):
-    idpattern = r"(?a:[_a-z][_a-z0-9]*([+-]1)?)"
+# `$$`, `$name` and `${name}` placeholders, where names may carry an integer
+# offset such as `layer_index+1`
+_PLACEHOLDER_RE = re.compile(
+    r"""\$(?:
+        (?P<escaped>\$) |
+        (?P<named>[_a-z][_a-z0-9]*(?:[+-][0-9]+)?) |
+        \{(?P<braced>[_a-z][_a-z0-9]*(?:[+-][0-9]+)?)\} |
+        (?P<invalid>)
+    )""",
+    re.IGNORECASE | re.ASCII | re.VERBOSE,
+)
+_OFFSET_RE = re.compile(
+    r"(?P<name>[_a-z][_a-z0-9]*)(?P<offset>[+-][0-9]+)", re.IGNORECASE | re.ASCII
+)
+
+
+class _FormatString(NamedTuple):
+    """A template string rewritten for `str.format_map`.
+
+    `format_string` is None if the template has a malformed placeholder.
+    """
+
+    template: str
+    format_string: Optional[str]
+
+
+class _TemplateSequence(NamedTuple):
+    """A list or tuple with at least one templated element."""
+
+    container: type
+    items: Tuple[Any, ...]
+
+
+def _compile_template(template: str) -> _FormatString:
+    """Parse a template string once so it can be filled in with `format_map`."""
+    parts = []
+    pos = 0
+    for match in _PLACEHOLDER_RE.finditer(template):
+        parts.append(
+            template[pos : match.start()].replace("{", "{{").replace("}", "}}")
+        )
+        if match.group("escaped") is not None:
+            parts.append("$")
+        elif match.group("invalid") is not None:
+            # leave malformed templates to fail when actually substituted
+            return _FormatString(template, None)
+        else:
+            parts.append("{" + (match.group("named") or match.group("braced")) + "}")
+        pos = match.end()
+    parts.append(template[pos:].replace("{", "{{").replace("}", "}}"))
+    return _FormatString(template, "".join(parts))
+
+
+def _compile_value(value: Any) -> Any:
+    """Compile any templates in a field value, or return None if it has none."""
+    if isinstance(value, str):
+        if "{" not in value:
+            return None
+        return _compile_template(value)
+    if isinstance(value, (list, tuple)):
+        compiled = [_compile_value(v) for v in value]
+        if not any(c is not None for c in compiled):
+            return None
+        return _TemplateSequence(
+            type(value),
+            tuple(v if c is None else c for v, c in zip(value, compiled)),
+        )
+    return None
+
+
+def _apply_template(value: Any, substitutions: Dict[str, int]) -> Any:
+    if isinstance(value, _FormatString):
+        if value.format_string is None:
+            raise ValueError(f"Invalid placeholder in template: {value.template!r}")
+        # the same substituted value is often produced by several templates
+        # (e.g. a space name shared by multiple weights), so keep a single copy
+        return sys.intern(value.format_string.format_map(substitutions))
+    if isinstance(value, _TemplateSequence):
+        return value.container(_apply_template(v, substitutions) for v in value.items)
+    return value
+
+
+class _CompiledTemplate(NamedTuple):
+    item: Union[WeightInfo, ProceduralSpaceInfo]
+    static_fields: Dict[str, Any]
+    templated_fields: List[Tuple[str, Union[_FormatString, _TemplateSequence]]]
+
+
+def _compile_item(item: Union[WeightInfo, ProceduralSpaceInfo]) -> _CompiledTemplate:
+    static_fields = {}
+    templated_fields = []
+    for key, value in item.model_dump(exclude_unset=True).items():
+        compiled = _compile_value(value)
+        if compiled is None:
+            static_fields[key] = value
+        else:
+            templated_fields.append((key, compiled))
+    return _CompiledTemplate(item, static_fields, templated_fields)
+
+
+class _Substitutions(dict):
+    """Template substitution values.
+
+    Only the base values are stored up front; placeholders with an offset
+    such as `layer_index+1` are computed the first time they are looked up.
+    """
+
+    def __missing__(self, key: str) -> int:
+        match = _OFFSET_RE.fullmatch(key)
+        if not match or match.group("name") not in self:
+            raise KeyError(key)
+        value = self[match.group("name")] + int(match.group("offset"))
+        self[key] = value
+        return value
+
+
+def _substitutions(num_layers: int, layer_idx: Optional[int] = None) -> _Substitutions:
+    substitutions = _Substitutions(num_layers=num_layers)
+    if layer_idx is not None:
+        substitutions["layer_index"] = layer_idx
+    return substitutions
 
 
 def _template_substitution(
@@ -179,23 +321,9 @@ def _template_substitution(
 ) -> str:
     if "{" not in template:
         return template
-
-    substitutions = {
-        "num_layers": num_layers,
-        "num_layers+1": num_layers + 1,
-        "num_layers-1": num_layers - 1,
-    }
-
-    if layer_idx is not None:
-        substitutions.update(
-            {
-                "layer_index": layer_idx,
-                "layer_index+1": layer_idx + 1,
-                "layer_index-1": layer_idx - 1,
-            }
-        )
-
-    return TemplateWithArithmetic(template).substitute(substitutions)
+    return _apply_template(
+        _compile_template(template), _substitutions(num_layers, layer_idx)
+    )
 
 
 def _hierarchy(names, layer_prefix=r"\.\d+\.") -> Dict[str, List[str]]:
@@ -309,84 +437,133 @@ class AutomaticArchitectureInfo(ArchitectureInfo, BaseModel):
 
 class JsonArchitectureInfo(ArchitectureInfo, BaseModel, frozen=True):
     definition: JSONArchitectureDefinition
+    _compiled_templates: Dict[str, List[_CompiledTemplate]] = PrivateAttr(
+        default_factory=dict
+    )
+    _substitution_cache: Dict[
+        Tuple[str, int, Optional[int]],
+        List[Union[WeightInfo, ProceduralSpaceInfo]],
+    ] = PrivateAttr(default_factory=dict)
+    _has_defined_spaces: bool = PrivateAttr(False)
+
+    def model_post_init(self, __context: Any) -> None:
+        templates = {
+            "pre": self.definition.pre_weights,
+            "layer": self.definition.layer_templates.weights,
+            "post": self.definition.post_weights,
+            "procedural": self.definition.procedural_spaces or [],
+            "layer_procedural": self.definition.layer_templates.procedural_spaces or [],
+        }
+        for kind, items in templates.items():
+            self._compiled_templates[kind] = [_compile_item(item) for item in items]
+
+        self._has_defined_spaces = bool(
+            self.definition.procedural_spaces
+            or self.definition.layer_templates.procedural_spaces
+        ) or any(
+            wi.input_space or wi.output_space
+            for wi in itertools.chain(
+                self.definition.layer_templates.weights,
+                self.definition.pre_weights,
+                self.definition.post_weights,
+            )
+        )
+
+    # compiled templates and cached substitutions are derived from the
+    # definition, so leave them out of comparison and serialization
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, JsonArchitectureInfo):
+            return NotImplemented
+        return self.definition == other.definition
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        state = super().__getstate__()
+        state["__pydantic_private__"] = None
+        return state
+
+    def __setstate__(self, state: Dict[Any, Any]) -> None:
+        super().__setstate__(state)
+        self.model_post_init(None)
 
     def _substitute(
         self,
-        item: Union[WeightInfo, ProceduralSpaceInfo],
+        template: _CompiledTemplate,
+        substitutions: Dict[str, int],
+    ) -> Union[WeightInfo, ProceduralSpaceInfo]:
+        if not template.templated_fields:
+            # nothing to substitute - the immutable definition entry can be shared
+            return template.item
+        obj_dict = dict(template.static_fields)
+        for key, value in template.templated_fields:
+            obj_dict[key] = _apply_template(value, substitutions)
+        # the definition was validated when loaded, so skip re-validation
+        return type(template.item).model_construct(**obj_dict)
+
+    def _substitute_cached(
+        self,
+        kind: str,
         config: PretrainedConfig,
         layer_idx: Optional[int] = None,
-    ) -> Union[WeightInfo, ProceduralSpaceInfo]:
+    ) -> List[Union[WeightInfo, ProceduralSpaceInfo]]:
+        # substitution results only depend on the layer count and index,
+        # and the definition is immutable, so they can be reused freely
         num_layers = self.num_layers(config)
-
-        obj_dict = item.model_dump(mode="json", exclude_unset=True)
-        for key in obj_dict:
-            if isinstance(obj_dict[key], str):
-                obj_dict[key] = _template_substitution(
-                    obj_dict[key], num_layers, layer_idx
-                )
-            elif isinstance(obj_dict[key], list):
-                obj_dict[key] = [
-                    (
-                        _template_substitution(s, num_layers, layer_idx)
-                        if isinstance(s, str)
-                        else s
-                    )
-                    for s in obj_dict[key]
-                ]
-        return type(item).model_validate(obj_dict)
+        key = (kind, num_layers, layer_idx)
+        res = self._substitution_cache.get(key)
+        if res is None:
+            substitutions = _substitutions(num_layers, layer_idx)
+            res = [
+                self._substitute(template, substitutions)
+                for template in self._compiled_templates[kind]
+            ]
+            self._substitution_cache[key] = res
+        return list(res)
 
     def name(self) -> str:
         return self.definition.expected_model_type
 
     def pre_weights(self, config: PretrainedConfig) -> List[WeightInfo]:
-        return [
-            self._substitute(wi, config=config) for wi in self.definition.pre_weights
-        ]
+        return self._substitute_cached("pre", config)
 
     def layer_weights(
         self, index: int, config: PretrainedConfig
     ) -> Optional[List[WeightInfo]]:
-        return [
-            self._substitute(wi, config=config, layer_idx=index)
-            for wi in self.definition.layer_templates.weights
-        ]
+        return self._substitute_cached("layer", config, layer_idx=index)
 
     def post_weights(self, config: PretrainedConfig) -> List[WeightInfo]:
-        return [
-            self._substitute(wi, config=config) for wi in self.definition.post_weights
-        ]
+        return self._substitute_cached("post", config)
 
     def sliceable(self) -> bool:
         return True
 
     def procedural_spaces(self, config: PretrainedConfig) -> List[ProceduralSpaceInfo]:
-        res = []
-        for s in self.definition.procedural_spaces or []:
-            res.append(self._substitute(s, config=config))
+        res = self._substitute_cached("procedural", config)
         for idx in range(self.num_layers(config)):
-            for s in self.definition.layer_templates.procedural_spaces or []:
-                res.append(self._substitute(s, config=config, layer_idx=idx))
+            res.extend(
+                self._substitute_cached("layer_procedural", config, layer_idx=idx)
+            )
         return res
 
     def has_defined_spaces(self) -> bool:
-        if (
-            self.definition.procedural_spaces
-            or self.definition.layer_templates.procedural_spaces
-        ):
-            return True
-        for wi in (
-            self.definition.layer_templates.weights
-            + self.definition.pre_weights
-            + self.definition.post_weights
-        ):
-            if wi.input_space or wi.output_space:
-                return True
-        return False
+        return self._has_defined_spaces
 
     def num_layers_config_key(self) -> str:
         return self.definition.num_layers_config_key
 
 
+@functools.lru_cache(maxsize=None)
+def _mixtral_moe_weights(num_experts: int, index: int) -> Tuple[WeightInfo, ...]:
+    prefix = f"model.layers.{index}"
+    tensor_names = []
+    for expert_idx in range(num_experts):
+        for param in ("w1", "w2", "w3"):
+            tensor_names.append(
+                prefix + f".block_sparse_moe.experts.{expert_idx}.{param}.weight"
+            )
+    tensor_names.append(prefix + ".block_sparse_moe.gate.weight")
+    return tuple(WeightInfo.model_construct(name=name) for name in tensor_names)
+
+
 class MixtralTensorNames(ArchitectureInfo, BaseModel):
     ARCHITECTURE_NAME: ClassVar[str] = "MixtralForCausalLM"
     num_local_experts: int
@@ -399,30 +576,19 @@ class MixtralTensorNames(ArchitectureInfo, BaseModel):
         return MixtralTensorNames(num_local_experts=config.num_local_experts)
 
     def pre_weights(self, config: PretrainedConfig) -> List[WeightInfo]:
-        return MISTRAL_INFO.pre_weights(config)
+        return _mistral_info().pre_weights(config)
 
     def post_weights(self, config: PretrainedConfig) -> List[WeightInfo]:
-        return MISTRAL_INFO.post_weights(config)
+        return _mistral_info().post_weights(config)
 
     def num_layers_config_key(self) -> str:
-        return MISTRAL_INFO.num_layers_config_key()
+        return _mistral_info().num_layers_config_key()
 
     def layer_weights(
         self, index: int, config: PretrainedConfig
     ) -> Optional[List[WeightInfo]]:
-        num_experts = self.num_local_experts
-        prefix = f"model.layers.{index}"
-        tensor_names = []
-        for expert_idx in range(num_experts):
-            for param in ("w1", "w2", "w3"):
-                tensor_names.append(
-                    prefix + f".block_sparse_moe.experts.{expert_idx}.{param}.weight"
-                )
-        tensor_names.append(prefix + ".block_sparse_moe.gate.weight")
-        res = []
-        for name in tensor_names:
-            res.append(WeightInfo(name=name))
-        for weight_info in MISTRAL_INFO.layer_weights(index, config):
+        res = list(_mixtral_moe_weights(self.num_local_experts, index))
+        for weight_info in _mistral_info().layer_weights(index, config):
             if ".mlp." in weight_info.name:
                 continue
             res.append(weight_info)
@@ -435,32 +601,53 @@ class MixtralTensorNames(ArchitectureInfo, BaseModel):
         return False
 
 
+@functools.lru_cache(maxsize=None)
 def _load_json_arch(name: str) -> JsonArchitectureInfo:
-    text = importlib.resources.read_text(mergekit._data.architectures, name)
+    data = (
+        importlib.resources.files(mergekit._data.architectures)
+        .joinpath(name)
+        .read_bytes()
+    )
     return JsonArchitectureInfo(
-        definition=JSONArchitectureDefinition.model_validate_json(text)
+        definition=JSONArchitectureDefinition.model_validate_json(data)
     )
 
 
+def _mistral_info() -> JsonArchitectureInfo:
+    return _load_json_arch("mistral.json")
+
+
+@functools.lru_cache(maxsize=None)
 def _load_all_architectures() -> (
-    Tuple[List[JsonArchitectureInfo], Dict[str, List[JsonArchitectureInfo]]]
+    Tuple[List[JsonArchitectureInfo], Mapping[str, Tuple[JsonArchitectureInfo, ...]]]
 ):
     architectures: List[JsonArchitectureInfo] = []
-    for f in importlib.resources.contents(mergekit._data.architectures):
-        if f.lower().endswith(".json"):
-            architectures.append(_load_json_arch(f))
+    for f in importlib.resources.files(mergekit._data.architectures).iterdir():
+        if f.name.lower().endswith(".json"):
+            architectures.append(_load_json_arch(f.name))
 
-    name_to_arch: Dict[str, List[JsonArchitectureInfo]] = {}
+    name_to_arch: Dict[str, List[JsonArchitectureInfo]] = defaultdict(list)
     for arch_info in architectures:
         for name in arch_info.definition.architectures:
-            name_to_arch[name] = name_to_arch.get(name, [])
             name_to_arch[name].append(arch_info)
-    return architectures, name_to_arch
+    return architectures, MappingProxyType(
+        {name: tuple(infos) for name, infos in name_to_arch.items()}
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "JSON_ARCHITECTURES": lambda: _load_all_architectures()[0],
+    "NAME_TO_ARCH": lambda: _load_all_architectures()[1],
+    "MISTRAL_INFO": _mistral_info,
+    "QWEN2_INFO": lambda: _load_json_arch("qwen2.json"),
+}
 
 
-JSON_ARCHITECTURES, NAME_TO_ARCH = _load_all_architectures()
-MISTRAL_INFO = _load_json_arch("mistral.json")
-QWEN2_INFO = _load_json_arch("qwen2.json")
+def __getattr__(name: str):
+    # architecture definitions are parsed on first use rather than at import
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class ArchitectureInfoUtils:
@@ -477,8 +664,9 @@ class ArchitectureInfoUtils:
         if arch_name == MixtralTensorNames.ARCHITECTURE_NAME:
             return MixtralTensorNames.from_config(config)
 
-        if arch_name in NAME_TO_ARCH:
-            candidates = list(NAME_TO_ARCH[arch_name])
+        _, name_to_arch = _load_all_architectures()
+        if arch_name in name_to_arch:
+            candidates = list(name_to_arch[arch_name])
             if len(candidates) == 1:
                 return candidates[0]
 
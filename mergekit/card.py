@@ -1,8 +1,11 @@
 # Copyright (C) 2025 Arcee AI
 # SPDX-License-Identifier: BUSL-1.1
 
+import functools
 import os
-from typing import Generator, List, Optional
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Generator, List, Optional, Tuple
 
 import huggingface_hub
 import yaml
@@ -12,6 +15,11 @@ from yaml.nodes import SequenceNode as SequenceNode
 from mergekit import merge_methods
 from mergekit.config import MergeConfiguration, ModelReference
 
+# repo ids are "name" or "namespace/name"; anything else must be a local path
+_HF_REPO_ID_RE = re.compile(r"[A-Za-z0-9][\w.\-]*(?:/[\w.\-]+)?")
+
+_YAML_DUMPER = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 CARD_TEMPLATE = """---
 {metadata}
 ---
@@ -59,6 +67,7 @@ The following command was used to extract this LoRA adapter:
 """
 
 
+@functools.lru_cache(maxsize=None)
 def is_hf(path: str) -> bool:
     """
     Determines if the given path is a Hugging Face model repository.
@@ -66,7 +75,7 @@ def is_hf(path: str) -> bool:
     Args:
         path: A string path to check.
     """
-    if path[0] in "/~" or path.count("/") > 1:
+    if not _HF_REPO_ID_RE.fullmatch(path):
         return False  # definitely a local path
     if not os.path.exists(path):
         return True  # If path doesn't exist locally, it must be a HF repo
@@ -83,12 +92,42 @@ def extract_hf_paths(models: List[ModelReference]) -> Generator[str, None, None]
     Args:
         models: A list of ModelReference objects.
     """
+    paths = []
     for model in models:
-        if is_hf(model.model.path):
-            yield model.model.path
+        paths.append(model.model.path)
+        if model.lora:
+            paths.append(model.lora.path)
+
+    # check each unique path concurrently - each may be a Hub round trip
+    unique_paths = list(dict.fromkeys(paths))
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        path_is_hf = dict(zip(unique_paths, executor.map(is_hf, unique_paths)))
 
-        if model.lora and is_hf(model.lora.path):
-            yield model.lora.path
+    for path in paths:
+        if path_is_hf[path]:
+            yield path
+
+
+@functools.lru_cache(maxsize=None)
+def card_metadata(
+    base_models: Tuple[str, ...], tags: Tuple[str, ...], library_name: str
+) -> str:
+    """
+    Returns the YAML front matter for a model card.
+
+    Args:
+        base_models: Hugging Face paths of the models the card is based on.
+        tags: Tags to apply to the model.
+        library_name: The library used to load the model.
+    """
+    return yaml.dump(
+        {
+            "base_model": list(base_models),
+            "tags": list(tags),
+            "library_name": library_name,
+        },
+        Dumper=_YAML_DUMPER,
+    )
 
 
 def method_md(merge_method: str) -> str:
@@ -174,9 +213,7 @@ def generate_card(
         model_bullets.append("* " + modelref_md(model))
 
     return CARD_TEMPLATE.format(
-        metadata=yaml.dump(
-            {"base_model": hf_bases, "tags": tags, "library_name": "transformers"}
-        ),
+        metadata=card_metadata(tuple(hf_bases), tuple(tags), "transformers"),
         model_list="\n".join(model_bullets),
         base_text=base_text,
         merge_method=method_md(config.merge_method),
@@ -213,9 +250,7 @@ def generate_card_lora(
         )
 
     return CARD_TEMPLATE_LORA.format(
-        metadata=yaml.dump(
-            {"base_model": hf_bases, "tags": tags, "library_name": "peft"}
-        ),
+        metadata=card_metadata(tuple(hf_bases), tuple(tags), "peft"),
         name=name,
         details=details,
         invocation=invocation,
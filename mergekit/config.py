@@ -196,11 +196,21 @@ class ConfigReader(BaseModel):
         return default
 
 
-class ConfigYamlDumper(yaml.Dumper):
+_NUMERIC_TYPES = (int, float)
+
+# prefer the libyaml-backed emitter when PyYAML was built with it
+_SafeDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+
+class ConfigYamlDumper(_SafeDumper):
     """Custom YAML dumper to format lists of numbers in flow style."""
 
     def represent_list(self, data: Iterable[Any]) -> yaml.SequenceNode:
-        flow_style = all(isinstance(e, (int, float)) for e in data)
+        flow_style = True
+        for e in data:
+            if not isinstance(e, _NUMERIC_TYPES):
+                flow_style = False
+                break
         return self.represent_sequence(
             "tag:yaml.org,2002:seq", data, flow_style=flow_style
         )
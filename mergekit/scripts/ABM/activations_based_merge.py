@@ -93,7 +93,7 @@ def main(
             u[i].to(device, dtype=dtype),
         )
 
-    for weight_info in model_arch_info.all_weights(config=model_config):
+    for weight_info in model_arch_info.iter_all_weights(config=model_config):
         merge_matrix, unmerge_matrix = None, None
 
         if weight_info.input_space in merge_unmerge_dictionary:
@@ -526,7 +526,7 @@ def all_weights_map(
     name_to_wi = {}
     model_cfg = model_ref.config(trust_remote_code=options.trust_remote_code)
     arch_info = ArchitectureInfoUtils.get_architecture_info(model_cfg)
-    for wi in arch_info.all_weights(model_cfg):
+    for wi in arch_info.iter_all_weights(model_cfg):
         name_to_wi[wi.name] = wi
     return name_to_wi
 
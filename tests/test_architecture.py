@@ -0,0 +1,184 @@
+import pickle
+from typing import Sequence
+
+import pytest
+from transformers import LlamaConfig
+
+from mergekit.architecture import (
+    JSONArchitectureDefinition,
+    JsonArchitectureInfo,
+    ProceduralSpaceInfo,
+    WeightInfo,
+    _template_substitution,
+)
+
+
+def make_arch_info() -> JsonArchitectureInfo:
+    return JsonArchitectureInfo(
+        definition=JSONArchitectureDefinition.model_validate(
+            {
+                "model_type": "llama",
+                "architectures": ["LlamaForCausalLM"],
+                "pre_weights": [
+                    {"name": "model.embed_tokens.weight", "is_embed": True}
+                ],
+                "num_layers_config_key": "num_hidden_layers",
+                "layer_templates": {
+                    "weights": [
+                        {
+                            "name": "model.layers.${layer_index}.mlp.weight",
+                            "input_space": "h_${layer_index}",
+                            "output_space": "h_${layer_index+1}",
+                            "aliases": ["layers.${layer_index}.mlp.weight"],
+                        }
+                    ],
+                    "procedural_spaces": [
+                        {
+                            "name": "h_${layer_index+1}",
+                            "type": "residual",
+                            "inputs": ["h_${layer_index}", "mlp_${layer_index}"],
+                        }
+                    ],
+                },
+                "post_weights": [
+                    {
+                        "name": "lm_head.weight",
+                        "input_space": "h_${num_layers}",
+                        "is_embed": True,
+                    }
+                ],
+            }
+        )
+    )
+
+
+def make_layer_template_info(
+    *names: str, pre_names: Sequence[str] = ()
+) -> JsonArchitectureInfo:
+    return JsonArchitectureInfo(
+        definition=JSONArchitectureDefinition.model_validate(
+            {
+                "model_type": "test",
+                "architectures": ["TestForCausalLM"],
+                "pre_weights": [{"name": name} for name in pre_names],
+                "num_layers_config_key": "num_hidden_layers",
+                "layer_templates": {"weights": [{"name": name} for name in names]},
+                "post_weights": [],
+            }
+        )
+    )
+
+
+class TestJsonArchitectureInfo:
+    def test_substitution(self):
+        arch_info = make_arch_info()
+        config = LlamaConfig(num_hidden_layers=3)
+
+        assert arch_info.layer_weights(1, config) == [
+            WeightInfo(
+                name="model.layers.1.mlp.weight",
+                input_space="h_1",
+                output_space="h_2",
+                aliases=("layers.1.mlp.weight",),
+            )
+        ]
+        # constructed without validation, so check field types survive
+        assert isinstance(hash(arch_info.layer_weights(1, config)[0]), int)
+        assert arch_info.post_weights(config) == [
+            WeightInfo(name="lm_head.weight", input_space="h_3", is_embed=True)
+        ]
+        assert arch_info.procedural_spaces(config)[2] == ProceduralSpaceInfo(
+            name="h_3", type="residual", inputs=("h_2", "mlp_2")
+        )
+        # identical substituted values share a single string
+        assert (
+            arch_info.layer_weights(1, config)[0].input_space
+            is arch_info.procedural_spaces(config)[0].name
+        )
+
+    def test_all_weights(self):
+        arch_info = make_arch_info()
+        config = LlamaConfig(num_hidden_layers=2)
+
+        names = [wi.name for wi in arch_info.all_weights(config)]
+        assert names == [
+            "model.embed_tokens.weight",
+            "model.layers.0.mlp.weight",
+            "model.layers.1.mlp.weight",
+            "lm_head.weight",
+        ]
+        assert list(arch_info.iter_all_weights(config)) == arch_info.all_weights(config)
+        # repeated calls must not be affected by mutating a returned list
+        arch_info.layer_weights(0, config).clear()
+        assert [wi.name for wi in arch_info.all_weights(config)] == names
+
+    def test_substitution_cache(self):
+        arch_info = make_arch_info()
+        config = LlamaConfig(num_hidden_layers=2)
+
+        first = arch_info.layer_weights(0, config)
+        assert arch_info.layer_weights(0, config)[0] is first[0]
+
+        # distinct configs with the same layer count share entries
+        other_config = LlamaConfig(num_hidden_layers=2)
+        assert arch_info.layer_weights(0, other_config)[0] is first[0]
+
+        # entries without placeholders are shared with the definition
+        assert arch_info.pre_weights(config)[0] is arch_info.definition.pre_weights[0]
+
+        # a different layer count gets its own entries
+        deeper_config = LlamaConfig(num_hidden_layers=4)
+        assert arch_info.post_weights(deeper_config)[0].input_space == "h_4"
+        assert arch_info.post_weights(config)[0].input_space == "h_2"
+
+    def test_untemplated_strings_unchanged(self):
+        arch_info = make_layer_template_info(
+            "$layer_index.w.${layer_index}", pre_names=["cost $5"]
+        )
+        config = LlamaConfig(num_hidden_layers=2)
+
+        assert arch_info.pre_weights(config)[0].name == "cost $5"
+        assert arch_info.layer_weights(1, config)[0].name == "1.w.1"
+
+    def test_template_escapes(self):
+        config = LlamaConfig(num_hidden_layers=2)
+
+        arch_info = make_layer_template_info("$${layer_index}.{x}")
+        assert arch_info.layer_weights(0, config)[0].name == "${layer_index}.{x}"
+
+        # malformed placeholders only fail when substituted
+        arch_info = make_layer_template_info("bad.${0}")
+        with pytest.raises(ValueError):
+            arch_info.layer_weights(0, config)
+
+    def test_template_offsets(self):
+        arch_info = make_layer_template_info(
+            "${layer_index-1}.${layer_index+2}.${num_layers-2}"
+        )
+        config = LlamaConfig(num_hidden_layers=4)
+
+        assert arch_info.layer_weights(1, config)[0].name == "0.3.2"
+
+        # offsets can't be applied to names that have no value
+        arch_info = make_layer_template_info("${hidden_size+1}")
+        with pytest.raises(KeyError):
+            arch_info.layer_weights(0, config)
+
+    def test_template_substitution(self):
+        # used directly by the activation-based merge scripts
+        assert _template_substitution("attn_qk_${layer_index+1}", 4, 2) == "attn_qk_3"
+        assert _template_substitution("h_${num_layers}", 4) == "h_4"
+        assert _template_substitution("cost $5", 4) == "cost $5"
+
+    def test_equality_and_pickling(self):
+        arch_info = make_arch_info()
+        config = LlamaConfig(num_hidden_layers=2)
+        weights = arch_info.all_weights(config)
+
+        # cached substitutions don't affect comparison with a fresh instance
+        assert arch_info == JsonArchitectureInfo(definition=arch_info.definition)
+
+        restored = pickle.loads(pickle.dumps(arch_info))
+        assert restored == arch_info
+        assert restored.all_weights(config) == weights
+        assert restored.has_defined_spaces()
@@ -0,0 +1,36 @@
+import yaml
+
+from mergekit.card import card_metadata, is_hf
+
+
+class TestIsHf:
+    def test_local_paths(self):
+        for path in [
+            "",
+            "/models/foo",
+            "~/foo",
+            "./foo",
+            "a/b/c",
+            "foo bar",
+            "org/name\n",
+        ]:
+            assert not is_hf(path), path
+
+    def test_remote_repo_ids(self):
+        # not present locally, so no Hub lookup is needed
+        for path in ["mergekit-test/does-not-exist", "does-not-exist-locally"]:
+            assert is_hf(path), path
+
+
+class TestCardMetadata:
+    def test_card_metadata(self):
+        metadata = card_metadata(("org/model",), ("mergekit", "merge"), "transformers")
+        assert yaml.safe_load(metadata) == {
+            "base_model": ["org/model"],
+            "tags": ["mergekit", "merge"],
+            "library_name": "transformers",
+        }
+        assert (
+            card_metadata(("org/model",), ("mergekit", "merge"), "transformers")
+            is metadata
+        )